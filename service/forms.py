@@ -5,9 +5,13 @@ from wtforms.fields import StringField, SubmitField, MultipleFileField, SelectFi
 from wtforms.validators import InputRequired, Length, Email
 
 from app.common.common_forms import HostAndPortForm
+from app.common.service.storage_probe import probe_directories
 
 
 class ServiceSettingsForm(FlaskForm):
+    DIRECTORIES_FIELDS = ['feedback_directory', 'timeshifts_directory', 'hls_directory', 'vods_directory',
+                          'cods_directory', 'proxy_directory', 'data_directory']
+
     name = StringField('Name:', validators=[InputRequired()])
     host = FormField(HostAndPortForm, 'Host:', validators=[])
     http_host = FormField(HostAndPortForm, 'Http host:', validators=[])
@@ -23,6 +27,28 @@ class ServiceSettingsForm(FlaskForm):
     data_directory = StringField('Data directory:', validators=[InputRequired()])
     apply = SubmitField('Apply')
 
+    def probe_storage(self, required_rates=None, benchmark=True) -> dict:
+        """Probe filled directories fields, required_rates: field name -> bytes per second
+
+        Rates aren't derived here, callers supply them from the streams they plan to write to each directory.
+        Without a rate the write rate isn't checked and the default free space minimum is used.
+        """
+        directories = {}
+        for name in ServiceSettingsForm.DIRECTORIES_FIELDS:
+            path = getattr(self, name).data
+            if path:
+                directories[name] = path
+        return probe_directories(directories, required_rates, benchmark)
+
+    def validate_storage(self, required_rates=None, benchmark=True) -> bool:
+        results = self.probe_storage(required_rates, benchmark)
+        valid = True
+        for name, result in results.items():
+            if not result.is_valid():
+                getattr(self, name).errors = list(getattr(self, name).errors) + result.errors
+                valid = False
+        return valid
+
     def make_entry(self):
         return self.update_entry(ServiceSettings())
 
@@ -0,0 +1,226 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SEQUENTIAL_WRITE_SIZE = 16 * 1024 * 1024
+SEQUENTIAL_BLOCK_SIZE = 1024 * 1024
+SMALL_FILE_SIZE = 4 * 1024
+SMALL_FILES_COUNT = 64
+MIN_FREE_SPACE = 1024 * 1024 * 1024
+TMPFS_MIN_FREE_SPACE = 64 * 1024 * 1024
+FREE_SPACE_SECONDS = 10 * 60
+MEMORY_FILESYSTEMS = ['tmpfs', 'ramfs']
+
+
+def min_free_space(required_rate, filesystem_type: str) -> int:
+    """Space for FREE_SPACE_SECONDS of writes when rate is known, otherwise a default by filesystem"""
+    if required_rate:
+        return int(required_rate * FREE_SPACE_SECONDS)
+    if filesystem_type in MEMORY_FILESYSTEMS:
+        return TMPFS_MIN_FREE_SPACE
+    return MIN_FREE_SPACE
+
+
+def get_filesystem_type(path: str):
+    """Type of the filesystem mounted closest to path, None when mounts can't be read"""
+    path = os.path.realpath(path)
+    best_mount = ''
+    best_type = None
+    try:
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace('\\040', ' ')
+                if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+                    if len(mount_point) >= len(best_mount):
+                        best_mount = mount_point
+                        best_type = parts[2]
+    except OSError:
+        return None
+    return best_type
+
+
+class StorageProbeResult:
+    def __init__(self, path: str, required_rate=None):
+        self.path = path
+        self.required_rate = required_rate
+        self.exists = False
+        self.readable = False
+        self.writable = False
+        self.free_space = None
+        self.min_free_space = None
+        self.filesystem_type = None
+        self.device = None
+        self.sequential_rate = None
+        self.small_files_rate = None
+        self.errors = []
+
+    def is_valid(self) -> bool:
+        return not self.errors
+
+    def meets_required_rate(self):
+        """None when rate is required but wasn't measured"""
+        if self.required_rate is None:
+            return True
+        if self.sequential_rate is None:
+            return None
+        return self.sequential_rate >= self.required_rate
+
+    def to_dict(self) -> dict:
+        return {'path': self.path, 'exists': self.exists, 'readable': self.readable, 'writable': self.writable,
+                'free_space': self.free_space, 'min_free_space': self.min_free_space,
+                'filesystem_type': self.filesystem_type,
+                'sequential_rate': self.sequential_rate, 'small_files_rate': self.small_files_rate,
+                'required_rate': self.required_rate, 'meets_required_rate': self.meets_required_rate(),
+                'errors': list(self.errors)}
+
+
+def _benchmark_sequential(path: str) -> float:
+    block = os.urandom(SEQUENTIAL_BLOCK_SIZE)
+    fd, file_path = tempfile.mkstemp(prefix='.probe_', dir=path)
+    try:
+        start = time.monotonic()
+        written = 0
+        while written < SEQUENTIAL_WRITE_SIZE:
+            written += os.write(fd, block)
+        os.fsync(fd)
+        elapsed = time.monotonic() - start
+    finally:
+        os.close(fd)
+        os.remove(file_path)
+    return written / max(elapsed, 1e-6)
+
+
+def _benchmark_small_files(path: str) -> float:
+    """Small files written and fsynced per second, close to hls segments and playlists updates"""
+    block = os.urandom(SMALL_FILE_SIZE)
+    probe_dir = tempfile.mkdtemp(prefix='.probe_', dir=path)
+    try:
+        start = time.monotonic()
+        for i in range(SMALL_FILES_COUNT):
+            fd = os.open(os.path.join(probe_dir, str(i)), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, block)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        elapsed = time.monotonic() - start
+    finally:
+        shutil.rmtree(probe_dir, ignore_errors=True)
+    return SMALL_FILES_COUNT / max(elapsed, 1e-6)
+
+
+def check_directory(path: str, required_rate=None) -> StorageProbeResult:
+    result = StorageProbeResult(path, required_rate)
+    if not os.path.isdir(path):
+        result.errors.append('Directory not exists')
+        return result
+
+    result.exists = True
+    result.readable = os.access(path, os.R_OK | os.X_OK)
+    result.writable = os.access(path, os.W_OK | os.X_OK)
+    if not result.readable:
+        result.errors.append('Directory not readable')
+    if not result.writable:
+        result.errors.append('Directory not writable')
+
+    result.filesystem_type = get_filesystem_type(path)
+    result.min_free_space = min_free_space(required_rate, result.filesystem_type)
+    try:
+        result.device = os.stat(path).st_dev
+        result.free_space = shutil.disk_usage(path).free
+    except OSError as ex:
+        result.errors.append('Failed to get free space: {0}'.format(ex))
+    else:
+        if result.free_space < result.min_free_space:
+            result.errors.append('Not enough free space, {0} bytes required'.format(result.min_free_space))
+    return result
+
+
+def benchmark_directory(result: StorageProbeResult):
+    try:
+        result.sequential_rate = _benchmark_sequential(result.path)
+        result.small_files_rate = _benchmark_small_files(result.path)
+    except OSError as ex:
+        result.errors.append('Write benchmark failed: {0}'.format(ex))
+        return False
+    return True
+
+
+def _check_required_rate(result: StorageProbeResult):
+    if result.meets_required_rate() is False:
+        result.errors.append('Write rate {0:.0f} B/s is lower than required {1:.0f} B/s'.format(
+            result.sequential_rate, result.required_rate))
+
+
+def probe_directory(path: str, required_rate=None, benchmark=True) -> StorageProbeResult:
+    result = check_directory(path, required_rate)
+    if benchmark and result.writable:
+        benchmark_directory(result)
+    _check_required_rate(result)
+    return result
+
+
+def _benchmark_device(results: list):
+    """Benchmark directories on one device once, they share its write rate"""
+    measured = results[0]
+    if not benchmark_directory(measured):
+        for result in results[1:]:
+            result.errors.append(measured.errors[-1])
+        return
+
+    device_required_rate = sum(result.required_rate for result in results if result.required_rate)
+    for result in results:
+        result.sequential_rate = measured.sequential_rate
+        result.small_files_rate = measured.small_files_rate
+        if len(results) > 1 and measured.sequential_rate < device_required_rate:
+            result.errors.append('Write rate {0:.0f} B/s is lower than {1:.0f} B/s required by all directories '
+                                 'on the device'.format(measured.sequential_rate, device_required_rate))
+
+
+def _check_device_free_space(results: list):
+    """Directories on one device share its free space, so it must cover all of them"""
+    free_space = results[0].free_space
+    if len(results) < 2 or free_space is None:
+        return
+
+    device_min_free_space = sum(result.min_free_space for result in results)
+    if free_space < device_min_free_space:
+        for result in results:
+            result.errors.append('Not enough free space, {0} bytes required by all directories on the '
+                                 'device'.format(device_min_free_space))
+
+
+def probe_directories(directories: dict, required_rates=None, benchmark=True) -> dict:
+    """Probe all directories, directories: name -> path, required_rates: name -> bytes per second
+
+    Checks run concurrently, benchmarks run one by one and once per device, so probes don't slow each other down.
+    Free space and write rate of a device are checked against the sum required by its directories.
+    """
+    if required_rates is None:
+        required_rates = {}
+    if not directories:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(directories)) as executor:
+        futures = {name: executor.submit(check_directory, path, required_rates.get(name))
+                   for name, path in directories.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    devices = {}
+    for result in results.values():
+        if result.device is not None:
+            devices.setdefault(result.device, []).append(result)
+    for same_device in devices.values():
+        _check_device_free_space(same_device)
+        writable = [result for result in same_device if result.writable]
+        if benchmark and writable:
+            _benchmark_device(writable)
+
+    for result in results.values():
+        _check_required_rate(result)
+    return results
@@ -0,0 +1,213 @@
+import json
+import logging
+import math
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+from wtforms.fields import StringField
+
+_logger = logging.getLogger(__name__)
+
+
+class ExtraConfigOptions:
+    """Stream config options which can be passed via extra config as name -> (type, min, max)
+
+    Options which the stream forms expose as fields are rejected, so extra config can't bypass their validators.
+    """
+
+    OPTIONS = {
+        'audio_tracks_count': (int, 1, 16),
+        'have_subtitle': (bool, None, None),
+        'decklink_video_mode': (int, 0, None),
+        'delay_time': (int, 0, None),
+        'auto_check_input': (bool, None, None),
+        'cleanup_ts': (bool, None, None),
+    }
+
+    FORM_OPTIONS = {'log_level', 'have_video', 'have_audio', 'audio_select', 'loop', 'restart_attempts',
+                    'auto_exit_time', 'video_parser', 'audio_parser', 'relay_video', 'relay_audio', 'deinterlace',
+                    'frame_rate', 'volume', 'video_codec', 'audio_codec', 'audio_channels', 'video_bitrate',
+                    'audio_bitrate', 'size', 'logo', 'rsvg_logo', 'aspect_ratio', 'timeshift_dir',
+                    'timeshift_chunk_duration', 'timeshift_chunk_life_time', 'timeshift_delay', 'input', 'output'}
+
+    @classmethod
+    def register(cls, name: str, value_type: type, min_value=None, max_value=None):
+        if name in cls.FORM_OPTIONS:
+            raise ValueError('Option {0} is set by the stream form'.format(name))
+        cls.OPTIONS[name] = (value_type, min_value, max_value)
+        parse_extra_config.cache_clear()
+        load_extra_config.cache_clear()
+
+    @classmethod
+    def coerce_value(cls, name: str, value):
+        if name in cls.FORM_OPTIONS:
+            raise ValueError('Option {0} is set by the stream form'.format(name))
+        option = cls.OPTIONS.get(name)
+        if option is None:
+            raise ValueError('Unknown extra config option: {0}'.format(name))
+
+        value_type, min_value, max_value = option
+        # bool is a subclass of int, so check it explicitly
+        if value_type is bool:
+            if not isinstance(value, bool):
+                raise ValueError('Option {0} must be a boolean'.format(name))
+            return value
+        if isinstance(value, bool):
+            raise ValueError('Option {0} must be {1}'.format(name, value_type.__name__))
+        if value_type is float and isinstance(value, int):
+            value = float(value)
+        if not isinstance(value, value_type):
+            raise ValueError('Option {0} must be {1}'.format(name, value_type.__name__))
+        if value_type is float and not math.isfinite(value):
+            raise ValueError('Option {0} must be a finite number'.format(name))
+        if min_value is not None and value < min_value:
+            raise ValueError('Option {0} must be at least {1}'.format(name, min_value))
+        if max_value is not None and value > max_value:
+            raise ValueError('Option {0} must be at most {1}'.format(name, max_value))
+        return value
+
+
+def _reject_constant(name: str):
+    raise ValueError('{0} is not allowed'.format(name))
+
+
+@lru_cache(maxsize=4096)
+def parse_extra_config(raw: str) -> MappingProxyType:
+    """Strict parse used when saving, results are cached per process by string"""
+    if raw is None or not raw.strip():
+        return MappingProxyType({})
+
+    try:
+        fields = json.loads(raw, parse_constant=_reject_constant)
+    except ValueError as ex:
+        raise ValueError('Invalid extra config json: {0}'.format(ex))
+
+    if not isinstance(fields, dict):
+        raise ValueError('Extra config must be a json object')
+
+    parsed = {}
+    for name, value in fields.items():
+        parsed[name] = ExtraConfigOptions.coerce_value(name, value)
+    return MappingProxyType(parsed)
+
+
+@lru_cache(maxsize=4096)
+def load_extra_config(raw: str) -> MappingProxyType:
+    """Tolerant parse for launches and config generation
+
+    Stored values saved before validation was added may fail it, their valid options are kept and the rest dropped.
+    Results are cached per process by string, so launches don't reparse.
+    """
+    try:
+        return parse_extra_config(raw)
+    except ValueError as ex:
+        _logger.warning('Invalid stored extra config %r, ignoring invalid options: %s', raw, ex)
+
+    try:
+        fields = json.loads(raw, parse_constant=_reject_constant)
+    except ValueError:
+        return MappingProxyType({})
+    if not isinstance(fields, dict):
+        return MappingProxyType({})
+
+    parsed = {}
+    for name, value in fields.items():
+        try:
+            parsed[name] = ExtraConfigOptions.coerce_value(name, value)
+        except ValueError:
+            continue
+    return MappingProxyType(parsed)
+
+
+def canonical_extra_config(parsed) -> str:
+    if not parsed:
+        return str()
+    return json.dumps(dict(parsed), sort_keys=True, separators=(',', ':'))
+
+
+class ExtraConfigField(StringField):
+    """Stringfield which validates extra config on submit and stores it in canonical form"""
+
+    def __init__(self, label='', validators=None, **kwargs):
+        super(ExtraConfigField, self).__init__(label, validators, **kwargs)
+        self.parsed = MappingProxyType({})
+        self.legacy_error = None
+
+    def process_data(self, value):
+        super(ExtraConfigField, self).process_data(value)
+        self.parsed = MappingProxyType({})
+        self.legacy_error = None
+        try:
+            self.parsed = parse_extra_config(self.data)
+        except ValueError as ex:
+            # stored value saved before validation, shown on the field until a valid value is submitted
+            self.legacy_error = 'Stored extra config is invalid: {0}'.format(ex)
+            self.errors = [self.legacy_error]
+            raise ValueError(self.legacy_error)
+
+    def process_formdata(self, valuelist):
+        if valuelist:
+            if self.legacy_error in self.process_errors:
+                self.process_errors.remove(self.legacy_error)
+            self.legacy_error = None
+            self.parsed = MappingProxyType({})
+            self.data = valuelist[0]
+            # raised ValueError goes to process_errors and fails validation
+            parsed = parse_extra_config(self.data)
+            self.parsed = parsed
+            self.data = canonical_extra_config(parsed)
+
+
+class ExtraConfigIndex:
+    """Stream id -> parsed extra config plus reverse index option -> stream ids
+
+    Call update_entry() after the stream is saved, new streams have no id before it, and remove() after it is
+    deleted. Stored values are loaded with load_extra_config, so invalid legacy options are not indexed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configs = {}
+        self._by_option = {}
+
+    def update(self, sid, raw: str):
+        parsed = load_extra_config(raw)
+        with self._lock:
+            self._remove_locked(sid)
+            if not parsed:
+                return parsed
+            self._configs[sid] = parsed
+            for name in parsed:
+                self._by_option.setdefault(name, set()).add(sid)
+        return parsed
+
+    def update_entry(self, entry):
+        return self.update(entry.id, entry.extra_config_fields)
+
+    def remove(self, sid):
+        with self._lock:
+            self._remove_locked(sid)
+
+    def get(self, sid) -> MappingProxyType:
+        with self._lock:
+            return self._configs.get(sid, MappingProxyType({}))
+
+    def streams_with_option(self, name: str, value=None) -> set:
+        with self._lock:
+            sids = self._by_option.get(name, set())
+            if value is None:
+                return set(sids)
+            return {sid for sid in sids if self._configs[sid][name] == value}
+
+    def _remove_locked(self, sid):
+        old = self._configs.pop(sid, None)
+        if not old:
+            return
+        for name in old:
+            sids = self._by_option.get(name)
+            if sids is None:
+                continue
+            sids.discard(sid)
+            if not sids:
+                del self._by_option[name]
@@ -8,6 +8,7 @@ from wtforms.fields import StringField, SubmitField, SelectField, IntegerField,
 from wtforms.validators import InputRequired, Length, NumberRange, Optional
 
 from app.common.common_forms import SizeForm, LogoForm, RationalForm, RSVGLogoForm, OutputUrlForm, InputUrlForm
+from app.common.stream.extra_config import ExtraConfigField
 
 
 class TagListField(StringField):
@@ -148,7 +149,7 @@ class HardwareStreamForm(IStreamForm):
     restart_attempts = IntegerField('Max restart attempts and frozen:',
                                     validators=[NumberRange(1, 1000)])
     auto_exit_time = IntegerField('Auto exit time:', validators=[Optional()])
-    extra_config_fields = StringField('Extra config args:', validators=[])
+    extra_config_fields = ExtraConfigField('Extra config args:', validators=[])
 
     def make_entry(self):
         return self.update_entry(HardwareStream())
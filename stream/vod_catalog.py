@@ -0,0 +1,274 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from itertools import chain, islice
+from operator import itemgetter
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_FLAGS_TABLE = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def tokenize(text: str) -> set:
+    if not text:
+        return set()
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+class _Bitmap:
+    """Growable bitset over catalog slots"""
+
+    def __init__(self):
+        self.bits = bytearray()
+
+    def set(self, slot: int):
+        byte = slot >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte - len(self.bits) + 1))
+        self.bits[byte] |= 1 << (slot & 7)
+
+    def clear(self, slot: int):
+        byte = slot >> 3
+        if byte < len(self.bits):
+            self.bits[byte] &= ~(1 << (slot & 7)) & 0xFF
+
+    def to_int(self) -> int:
+        return int.from_bytes(self.bits, 'little')
+
+
+class VodCatalogIndex:
+    """Incrementally maintained search index over vod/series entries
+
+    Text is matched against an inverted index of name and description tokens, vod type and country are
+    filtered with bitmaps and results are ordered by sorted arrays. Few matches are sorted directly, many matches
+    are paged by walking the sorted array until the page is filled.
+    The forms don't update the index: call update_entry() after a vod stream is saved, new streams have no id before
+    it, and remove() after it is deleted. Nothing calls remove() on stream delete yet, deleted streams stay searchable
+    until the caller wires it up or rebuilds the index with load().
+    """
+
+    SORT_NAME = 'name'
+    SORT_USER_SCORE = 'user_score'
+    SORT_PRIME_DATE = 'prime_date'
+    SORT_DURATION = 'duration'
+    SORT_FIELDS = [SORT_NAME, SORT_USER_SCORE, SORT_PRIME_DATE, SORT_DURATION]
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self._slots = {}  # sid -> slot
+        self._sids = []  # slot -> sid
+        self._records = []  # slot -> indexed values
+        self._free_slots = []
+        self._tokens = {}  # token -> set of slots
+        self._types = {}  # vod_type -> _Bitmap
+        self._countries = {}  # country -> _Bitmap
+        self._all = _Bitmap()
+        self._sorted = {field: [] for field in VodCatalogIndex.SORT_FIELDS}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def update_entry(self, entry):
+        self.update(entry.id, name=entry.name, description=entry.description, vod_type=entry.vod_type,
+                    country=entry.country, user_score=entry.user_score, prime_date=entry.prime_date,
+                    duration=entry.duration)
+
+    def load(self, entries):
+        """Replaces index content, sorts arrays once instead of inserting one by one"""
+        with self._lock:
+            self._reset_locked()
+            for entry in entries:
+                if entry.id in self._slots:
+                    continue
+                self._add_locked(entry.id, self._make_record(entry.name, entry.description, entry.vod_type,
+                                                             entry.country, entry.user_score, entry.prime_date,
+                                                             entry.duration), False)
+            for array in self._sorted.values():
+                array.sort()
+
+    def update(self, sid, name: str, description: str, vod_type, country: str, user_score: float, prime_date,
+               duration: int):
+        record = self._make_record(name, description, vod_type, country, user_score, prime_date, duration)
+        with self._lock:
+            self._remove_locked(sid)
+            self._add_locked(sid, record, True)
+
+    def remove(self, sid):
+        with self._lock:
+            self._remove_locked(sid)
+
+    def search(self, text=None, vod_type=None, country=None, sort_by=SORT_NAME, descending=False, offset=0,
+               limit=20) -> tuple:
+        """Returns total matches count and a page of stream ids"""
+        if sort_by not in self._sorted:
+            raise ValueError('Unknown sort field: {0}'.format(sort_by))
+
+        with self._lock:
+            array = self._sorted[sort_by]
+            mask = self._filter_mask(vod_type, country)
+            candidates = None
+            test = None
+            if text:
+                candidates = self._match_text(text)
+                if mask is not None:
+                    candidates = list(filter(self._bits_flags(self._mask_bits(mask)).__getitem__, candidates))
+                total = len(candidates)
+            elif mask is not None:
+                bits = self._mask_bits(mask)
+                total = bits.count('1')
+                if self._sort_directly(total, offset, limit, len(array)):
+                    candidates = self._bits_slots(bits)
+                else:
+                    test = self._bits_flags(bits).__getitem__
+            else:
+                total = len(self._slots)
+
+            if total == 0 or offset >= total:
+                return total, []
+
+            if candidates is not None:
+                if self._sort_directly(total, offset, limit, len(array)):
+                    array = [self._sort_key(self._records[slot][sort_by], slot) for slot in candidates]
+                    array.sort()
+                else:
+                    test = (candidates if isinstance(candidates, set) else set(candidates)).__contains__
+
+            if test is None:
+                keys = self._page(array, descending, offset, limit)
+                return total, [self._sids[key[2]] for key in keys]
+
+            # walk the sorted keys with C level iterators until the page is filled
+            slots = filter(test, map(itemgetter(2), self._descending(array) if descending else array))
+            return total, [self._sids[slot] for slot in islice(slots, offset, offset + limit)]
+
+    @staticmethod
+    def _sort_key(value, slot: int) -> tuple:
+        # entries without value go last
+        return value is None, value, slot
+
+    @staticmethod
+    def _sort_directly(count: int, offset: int, limit: int, size: int) -> bool:
+        """Sorting matches costs about count log count, walking the array (offset + limit) * size / count cheap steps"""
+        return count * count * 32 < (offset + limit) * size
+
+    @staticmethod
+    def _descending(keys: list):
+        split = bisect_left(keys, (True,))
+        return chain(islice(reversed(keys), len(keys) - split, None), islice(keys, split, None))
+
+    @staticmethod
+    def _page(keys: list, descending: bool, offset: int, limit: int) -> list:
+        if not descending:
+            return keys[offset:offset + limit]
+
+        split = bisect_left(keys, (True,))
+        page = []
+        if offset < split:
+            stop = max(split - offset - limit, 0)
+            page = keys[stop:split - offset][::-1]
+        start = max(offset, split)
+        return page + keys[start:start + limit - len(page)]
+
+    @staticmethod
+    def _mask_bits(mask: int) -> str:
+        """Bits as '0'/'1' string indexed by slot"""
+        return bin(mask)[:1:-1]
+
+    def _bits_flags(self, bits: str) -> bytes:
+        return bits.ljust(len(self._sids), '0').encode().translate(_FLAGS_TABLE)
+
+    @staticmethod
+    def _bits_slots(bits: str) -> list:
+        slots = []
+        slot = bits.find('1')
+        while slot != -1:
+            slots.append(slot)
+            slot = bits.find('1', slot + 1)
+        return slots
+
+    def _filter_mask(self, vod_type, country):
+        if vod_type is None and country is None:
+            return None
+
+        mask = self._all.to_int()
+        if vod_type is not None:
+            bitmap = self._types.get(vod_type)
+            mask &= bitmap.to_int() if bitmap else 0
+        if country is not None:
+            bitmap = self._countries.get(country.lower())
+            mask &= bitmap.to_int() if bitmap else 0
+        return mask
+
+    def _match_text(self, text: str):
+        """Matching slots, a set owned by the index may be returned so it must not be modified"""
+        tokens = tokenize(text)
+        if not tokens:
+            return list(self._slots.values())
+
+        matches = []
+        for token in tokens:
+            slots = self._tokens.get(token)
+            if not slots:
+                return []
+            matches.append(slots)
+        if len(matches) == 1:
+            return matches[0]
+        matches.sort(key=len)
+        return set.intersection(*matches)
+
+    @staticmethod
+    def _make_record(name: str, description: str, vod_type, country: str, user_score: float, prime_date,
+                     duration: int) -> dict:
+        return {'tokens': tokenize(name) | tokenize(description), 'vod_type': vod_type,
+                'country': country.lower() if country else country,
+                VodCatalogIndex.SORT_NAME: name.lower() if name else name,
+                VodCatalogIndex.SORT_USER_SCORE: user_score, VodCatalogIndex.SORT_PRIME_DATE: prime_date,
+                VodCatalogIndex.SORT_DURATION: duration}
+
+    def _add_locked(self, sid, record: dict, keep_sorted: bool):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._sids[slot] = sid
+            self._records[slot] = record
+        else:
+            slot = len(self._sids)
+            self._sids.append(sid)
+            self._records.append(record)
+        self._slots[sid] = slot
+
+        for token in record['tokens']:
+            self._tokens.setdefault(token, set()).add(slot)
+        self._types.setdefault(record['vod_type'], _Bitmap()).set(slot)
+        self._countries.setdefault(record['country'], _Bitmap()).set(slot)
+        self._all.set(slot)
+        for field in VodCatalogIndex.SORT_FIELDS:
+            key = self._sort_key(record[field], slot)
+            if keep_sorted:
+                insort(self._sorted[field], key)
+            else:
+                self._sorted[field].append(key)
+
+    def _remove_locked(self, sid):
+        slot = self._slots.pop(sid, None)
+        if slot is None:
+            return
+
+        record = self._records[slot]
+        for token in record['tokens']:
+            slots = self._tokens.get(token)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._tokens[token]
+        self._types[record['vod_type']].clear(slot)
+        self._countries[record['country']].clear(slot)
+        self._all.clear(slot)
+        for field in VodCatalogIndex.SORT_FIELDS:
+            array = self._sorted[field]
+            del array[bisect_left(array, self._sort_key(record[field], slot))]
+
+        self._sids[slot] = None
+        self._records[slot] = None
+        self._free_slots.append(slot)
@@ -0,0 +1,152 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+
+class ExpiryScheduler:
+    """Min-heap of subscribers keyed by exp_date
+
+    Rescheduling pushes a new heap item and leaves the old one as stale, stale items are skipped when popped
+    and dropped when the heap gets compacted.
+    Call schedule_subscriber() after the subscriber is saved, new subscribers have no id before it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []  # (exp_date, seq, sid)
+        self._current = {}  # sid -> (exp_date, seq)
+        self._seq = 0
+        self._in_flight = {}  # sid -> scheduled or cancelled while fire_expired callback runs
+
+    def __len__(self):
+        return len(self._current)
+
+    def __contains__(self, sid):
+        return sid in self._current
+
+    def schedule(self, sid, exp_date: datetime):
+        with self._lock:
+            self._touch_locked(sid)
+            current = self._current.get(sid)
+            if current is not None and current[0] == exp_date:
+                return
+
+            self._push_locked(sid, exp_date)
+
+    def schedule_subscriber(self, subscriber):
+        if subscriber.status == subscriber.Status.ACTIVE:
+            self.schedule(subscriber.id, subscriber.exp_date)
+        else:
+            self.cancel(subscriber.id)
+
+    def cancel(self, sid):
+        with self._lock:
+            self._touch_locked(sid)
+            if self._current.pop(sid, None) is not None:
+                self._compact_locked()
+
+    def pop_expired(self, now=None) -> list:
+        """Remove and return subscribers expired at now, work is proportional to expired count"""
+        if now is None:
+            now = datetime.now()
+
+        expired = []
+        with self._lock:
+            item = self._pop_expired_locked(now)
+            while item is not None:
+                expired.append(item[0])
+                item = self._pop_expired_locked(now)
+        return expired
+
+    def fire_expired(self, callback, now=None) -> int:
+        """Call callback(sid) for every expired subscriber, e.g. to set Subscriber.Status.NOT_ACTIVE
+
+        Subscribers are popped one by one. If callback raises, the subscriber is scheduled back with its exp_date
+        so the next call retries it, unless it was scheduled or cancelled while the callback was running.
+        The rest are still fired and then the first exception is re-raised.
+        Returns count of successful callbacks.
+        """
+        if now is None:
+            now = datetime.now()
+
+        fired = 0
+        failed = []
+        error = None
+        while True:
+            with self._lock:
+                item = self._pop_expired_locked(now)
+                if item is not None:
+                    self._in_flight[item[0]] = False
+            if item is None:
+                break
+
+            try:
+                callback(item[0])
+            except Exception as ex:
+                # stays in flight until the loop ends, pushed back now it would be popped again
+                failed.append(item)
+                if error is None:
+                    error = ex
+            else:
+                fired += 1
+                with self._lock:
+                    self._in_flight.pop(item[0], None)
+
+        with self._lock:
+            for sid, exp_date in failed:
+                # don't override schedule changed while callback was running
+                if not self._in_flight.pop(sid, True):
+                    self._push_locked(sid, exp_date)
+        if error is not None:
+            raise error
+        return fired
+
+    def expiring_within(self, days: int, now=None) -> list:
+        """Subscribers with exp_date in [now, now + days] as sorted (exp_date, sid) pairs"""
+        if now is None:
+            now = datetime.now()
+        until = now + timedelta(days=days)
+
+        result = []
+        with self._lock:
+            # walk only heap nodes not later than until, their children can't be earlier than them
+            stack = [0] if self._heap else []
+            while stack:
+                i = stack.pop()
+                exp_date, seq, sid = self._heap[i]
+                if exp_date > until:
+                    continue
+                current = self._current.get(sid)
+                if exp_date >= now and current is not None and current[1] == seq:
+                    result.append((exp_date, sid))
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(self._heap):
+                        stack.append(child)
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def _touch_locked(self, sid):
+        if sid in self._in_flight:
+            self._in_flight[sid] = True
+
+    def _push_locked(self, sid, exp_date: datetime):
+        self._seq += 1
+        self._current[sid] = (exp_date, self._seq)
+        heapq.heappush(self._heap, (exp_date, self._seq, sid))
+        self._compact_locked()
+
+    def _pop_expired_locked(self, now: datetime):
+        while self._heap and self._heap[0][0] <= now:
+            exp_date, seq, sid = heapq.heappop(self._heap)
+            current = self._current.get(sid)
+            if current is None or current[1] != seq:
+                continue
+            del self._current[sid]
+            return sid, exp_date
+        return None
+
+    def _compact_locked(self):
+        if len(self._heap) <= 2 * len(self._current) + 64:
+            return
+        self._heap = [(exp_date, seq, sid) for sid, (exp_date, seq) in self._current.items()]
+        heapq.heapify(self._heap)
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import threading
+import time
+
+import pyfastocloud_models.constants as constants
+
+
+class _SessionShard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}  # subscriber id -> {device id -> expire time}
+        self.limits = {}  # subscriber id -> max devices count
+
+    def drop(self, sid):
+        self.subscribers.pop(sid, None)
+        self.limits.pop(sid, None)
+
+
+class DeviceSessionRegistry:
+    """Active device sessions per subscriber, used to enforce Subscriber.max_devices_count
+
+    Subscribers are spread over lock striped shards so workers checking different subscribers don't contend.
+    A device stays admitted while it sends heartbeats, silent devices expire after ttl seconds.
+    Subscriber and device ids must be strings, so sessions restored from snapshot match.
+    """
+
+    DEFAULT_SHARDS_COUNT = 64
+    DEFAULT_TTL = 60
+
+    def __init__(self, ttl=DEFAULT_TTL, shards_count=DEFAULT_SHARDS_COUNT, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._shards = [_SessionShard() for _ in range(shards_count)]
+
+    def _shard(self, sid) -> _SessionShard:
+        return self._shards[hash(sid) % len(self._shards)]
+
+    def admit(self, sid: str, did: str, max_devices=constants.DEFAULT_DEVICES_COUNT) -> bool:
+        if not isinstance(sid, str) or not isinstance(did, str):
+            raise TypeError('Subscriber and device ids must be strings')
+
+        shard = self._shard(sid)
+        now = self._clock()
+        with shard.lock:
+            shard.limits[sid] = max_devices
+            devices = shard.subscribers.get(sid)
+            if devices is None:
+                devices = shard.subscribers[sid] = {}
+
+            if did in devices:
+                devices[did] = now + self.ttl
+                return True
+
+            if len(devices) >= max_devices:
+                # evict only when full, bounded by max devices count
+                for device, expire in list(devices.items()):
+                    if expire <= now:
+                        del devices[device]
+                if len(devices) >= max_devices:
+                    if not devices:
+                        shard.drop(sid)
+                    return False
+
+            devices[did] = now + self.ttl
+            return True
+
+    def admit_subscriber(self, subscriber, did) -> bool:
+        return self.admit(str(subscriber.id), str(did), subscriber.max_devices_count)
+
+    def heartbeat(self, sid: str, did: str) -> bool:
+        shard = self._shard(sid)
+        now = self._clock()
+        with shard.lock:
+            devices = shard.subscribers.get(sid)
+            if devices is None or did not in devices:
+                return False
+            if devices[did] <= now:
+                # expired session must be admitted again, the slot may be taken
+                del devices[did]
+                if not devices:
+                    shard.drop(sid)
+                return False
+            devices[did] = now + self.ttl
+            return True
+
+    def release(self, sid: str, did: str):
+        shard = self._shard(sid)
+        with shard.lock:
+            devices = shard.subscribers.get(sid)
+            if devices is None:
+                return
+            devices.pop(did, None)
+            if not devices:
+                shard.drop(sid)
+
+    def release_all(self, sid: str):
+        shard = self._shard(sid)
+        with shard.lock:
+            shard.drop(sid)
+
+    def active_devices(self, sid: str) -> list:
+        shard = self._shard(sid)
+        now = self._clock()
+        with shard.lock:
+            devices = shard.subscribers.get(sid, {})
+            return [did for did, expire in devices.items() if expire > now]
+
+    def evict_expired(self) -> int:
+        """Drop dead devices in all shards, returns evicted count"""
+        evicted = 0
+        for shard in self._shards:
+            now = self._clock()
+            with shard.lock:
+                for sid in list(shard.subscribers):
+                    devices = shard.subscribers[sid]
+                    for did in [did for did, expire in devices.items() if expire <= now]:
+                        del devices[did]
+                        evicted += 1
+                    if not devices:
+                        shard.drop(sid)
+        return evicted
+
+    def save_snapshot(self, path: str):
+        """Atomically write live sessions with their remaining ttl and subscriber devices limit"""
+        sessions = []
+        for shard in self._shards:
+            now = self._clock()
+            with shard.lock:
+                for sid, devices in shard.subscribers.items():
+                    max_devices = shard.limits.get(sid, constants.DEFAULT_DEVICES_COUNT)
+                    for did, expire in devices.items():
+                        if expire > now:
+                            sessions.append([sid, did, expire - now, max_devices])
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as snapshot:
+            json.dump({'time': time.time(), 'sessions': sessions}, snapshot)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str) -> int:
+        """Restore sessions which are still alive, time spent down counts against their ttl
+
+        Malformed rows are skipped and devices over the subscriber limit are dropped, freshest sessions are kept.
+        """
+        try:
+            with open(path) as snapshot:
+                data = json.load(snapshot)
+        except (OSError, ValueError):
+            return 0
+
+        if not isinstance(data, dict) or not isinstance(data.get('sessions'), list):
+            return 0
+        saved_time = data.get('time')
+        if not isinstance(saved_time, (int, float)) or isinstance(saved_time, bool) or not math.isfinite(saved_time):
+            return 0
+
+        downtime = max(time.time() - saved_time, 0)
+        rows = []
+        for row in data['sessions']:
+            session = self._parse_snapshot_row(row)
+            if session is not None and session[2] > downtime:
+                rows.append(session)
+        rows.sort(key=lambda session: session[2], reverse=True)
+
+        now = self._clock()
+        loaded = 0
+        for sid, did, remaining, max_devices in rows:
+            shard = self._shard(sid)
+            with shard.lock:
+                devices = shard.subscribers.setdefault(sid, {})
+                shard.limits.setdefault(sid, max_devices)
+                if did not in devices and len(devices) >= shard.limits[sid]:
+                    continue
+                expire = now + remaining - downtime
+                if did in devices and devices[did] >= expire:
+                    # a fresher session is already there, nothing restored
+                    continue
+                devices[did] = expire
+            loaded += 1
+        return loaded
+
+    @staticmethod
+    def _parse_snapshot_row(row):
+        if not isinstance(row, list) or len(row) != 4:
+            return None
+        sid, did, remaining, max_devices = row
+        if not isinstance(sid, str) or not isinstance(did, str):
+            return None
+        if not isinstance(remaining, (int, float)) or isinstance(remaining, bool) or not math.isfinite(remaining):
+            return None
+        if not isinstance(max_devices, int) or isinstance(max_devices, bool) or max_devices < 1:
+            return None
+        return sid, did, remaining, max_devices
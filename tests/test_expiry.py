@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app.common.subscriber.expiry import ExpiryScheduler
+
+NOW = datetime(2026, 1, 1)
+
+
+class ExpirySchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ExpiryScheduler()
+
+    def test_pop_expired(self):
+        for sid in range(10):
+            self.scheduler.schedule(sid, NOW + timedelta(days=sid - 5))
+        self.assertEqual(sorted(self.scheduler.pop_expired(NOW)), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self.scheduler.pop_expired(NOW), [])
+        self.assertEqual(len(self.scheduler), 4)
+
+    def test_stale_and_cancelled(self):
+        self.scheduler.schedule(1, NOW - timedelta(days=1))
+        self.scheduler.schedule(1, NOW + timedelta(days=1))
+        self.scheduler.schedule(2, NOW - timedelta(days=1))
+        self.scheduler.cancel(2)
+        self.scheduler.schedule(3, NOW + timedelta(days=2))
+        self.scheduler.schedule(3, NOW - timedelta(days=2))
+
+        self.assertEqual(self.scheduler.pop_expired(NOW), [3])
+        self.assertNotIn(2, self.scheduler)
+        self.assertEqual(self.scheduler.pop_expired(NOW + timedelta(days=1)), [1])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_compaction_keeps_schedule(self):
+        for i in range(1000):
+            self.scheduler.schedule(i % 10, NOW + timedelta(minutes=i))
+        self.assertLess(len(self.scheduler._heap), 100)
+        self.assertEqual(sorted(self.scheduler.pop_expired(NOW + timedelta(minutes=995))), [0, 1, 2, 3, 4, 5])
+
+    def test_expiring_within(self):
+        for sid in range(30):
+            self.scheduler.schedule(sid, NOW + timedelta(days=sid - 10, hours=1))
+        self.scheduler.cancel(12)
+        self.scheduler.schedule(13, NOW + timedelta(days=100))
+
+        result = self.scheduler.expiring_within(5, NOW)
+        self.assertEqual([sid for _, sid in result], [10, 11, 14])
+        self.assertEqual([exp_date for exp_date, _ in result], sorted(exp_date for exp_date, _ in result))
+
+    def test_fire_expired(self):
+        for sid in range(5):
+            self.scheduler.schedule(sid, NOW - timedelta(days=1))
+        fired = []
+        self.assertEqual(self.scheduler.fire_expired(fired.append, NOW), 5)
+        self.assertEqual(sorted(fired), [0, 1, 2, 3, 4])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_fire_expired_callback_raises(self):
+        for sid in [7, 9, 11]:
+            self.scheduler.schedule(sid, NOW - timedelta(days=sid))
+        fired = []
+
+        def callback(sid):
+            if sid == 7:
+                raise RuntimeError('storage is down')
+            fired.append(sid)
+
+        with self.assertRaises(RuntimeError):
+            self.scheduler.fire_expired(callback, NOW)
+        self.assertEqual(sorted(fired), [9, 11])
+        self.assertIn(7, self.scheduler)
+        self.assertNotIn(9, self.scheduler)
+
+        self.assertEqual(self.scheduler.fire_expired(fired.append, NOW), 1)
+        self.assertEqual(sorted(fired), [7, 9, 11])
+
+    def test_fire_expired_keeps_reschedule_from_callback(self):
+        self.scheduler.schedule(1, NOW - timedelta(days=1))
+        new_date = NOW + timedelta(days=30)
+
+        def callback(sid):
+            self.scheduler.schedule(sid, new_date)
+            raise RuntimeError('failed after renewal')
+
+        with self.assertRaises(RuntimeError):
+            self.scheduler.fire_expired(callback, NOW)
+        self.assertEqual(self.scheduler.expiring_within(31, NOW), [(new_date, 1)])
+
+    def test_fire_expired_keeps_cancel_from_callback(self):
+        self.scheduler.schedule(1, NOW - timedelta(days=1))
+        self.scheduler.schedule(2, NOW - timedelta(days=2))
+
+        def callback(sid):
+            if sid == 1:
+                self.scheduler.cancel(sid)
+            raise RuntimeError('failed after cancel')
+
+        with self.assertRaises(RuntimeError):
+            self.scheduler.fire_expired(callback, NOW)
+        self.assertNotIn(1, self.scheduler)
+        self.assertIn(2, self.scheduler)
+        self.assertEqual(self.scheduler.pop_expired(NOW), [2])
+        self.assertEqual(self.scheduler.pop_expired(NOW), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
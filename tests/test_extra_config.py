@@ -0,0 +1,97 @@
+import unittest
+
+from wtforms import Form
+
+from app.common.stream.extra_config import ExtraConfigField, ExtraConfigIndex, parse_extra_config, \
+    canonical_extra_config, load_extra_config
+
+
+class _FormData(dict):
+    def getlist(self, key):
+        return [self[key]] if key in self else []
+
+
+class _ExtraConfigForm(Form):
+    extra_config_fields = ExtraConfigField('Extra config args:')
+
+
+class _Stream:
+    def __init__(self, extra_config_fields: str):
+        self.extra_config_fields = extra_config_fields
+
+
+class ExtraConfigTest(unittest.TestCase):
+    def test_accepts_known_options(self):
+        parsed = parse_extra_config('{"have_subtitle": true, "audio_tracks_count": 2}')
+        self.assertEqual(dict(parsed), {'have_subtitle': True, 'audio_tracks_count': 2})
+        self.assertEqual(canonical_extra_config(parsed), '{"audio_tracks_count":2,"have_subtitle":true}')
+
+    def test_empty(self):
+        self.assertEqual(dict(parse_extra_config('')), {})
+        self.assertEqual(canonical_extra_config(parse_extra_config('  ')), '')
+
+    def test_rejects_invalid(self):
+        for raw in ['{', '[1]', '{"unknown": 1}', '{"have_subtitle": 1}', '{"audio_tracks_count": true}',
+                    '{"audio_tracks_count": 0}', '{"audio_tracks_count": 17}', '{"delay_time": -1}',
+                    '{"delay_time": NaN}', '{"delay_time": Infinity}']:
+            with self.assertRaises(ValueError, msg=raw):
+                parse_extra_config(raw)
+
+    def test_rejects_form_options(self):
+        for raw in ['{"restart_attempts": -5}', '{"log_level": 99}', '{"volume": 1.0}', '{"loop": true}']:
+            with self.assertRaises(ValueError, msg=raw):
+                parse_extra_config(raw)
+
+    def test_field_stores_canonical(self):
+        form = _ExtraConfigForm(_FormData(extra_config_fields='{ "cleanup_ts" : true }'))
+        self.assertTrue(form.validate())
+        self.assertEqual(form.extra_config_fields.data, '{"cleanup_ts":true}')
+        self.assertEqual(dict(form.extra_config_fields.parsed), {'cleanup_ts': True})
+
+    def test_field_rejects_invalid(self):
+        form = _ExtraConfigForm(_FormData(extra_config_fields='{"restart_attempts": -5}'))
+        self.assertFalse(form.validate())
+        self.assertEqual(form.extra_config_fields.data, '{"restart_attempts": -5}')
+        self.assertEqual(dict(form.extra_config_fields.parsed), {})
+
+    def test_load_legacy(self):
+        legacy = '{"restart_attempts": 5, "cleanup_ts": true, "delay_time": -1}'
+        with self.assertRaises(ValueError):
+            parse_extra_config(legacy)
+        self.assertEqual(dict(load_extra_config(legacy)), {'cleanup_ts': True})
+        self.assertEqual(dict(load_extra_config('not json')), {})
+        self.assertEqual(dict(load_extra_config('{"cleanup_ts": false}')), {'cleanup_ts': False})
+
+    def test_field_legacy_value(self):
+        legacy = '{"restart_attempts": 5}'
+        form = _ExtraConfigForm(obj=_Stream(legacy))
+        self.assertEqual(form.extra_config_fields.data, legacy)
+        self.assertEqual(len(form.extra_config_fields.errors), 1)
+        self.assertFalse(form.validate())
+
+        form = _ExtraConfigForm(_FormData(extra_config_fields='{"cleanup_ts": true}'), obj=_Stream(legacy))
+        self.assertTrue(form.validate())
+        self.assertEqual(form.extra_config_fields.data, '{"cleanup_ts":true}')
+
+    def test_index(self):
+        index = ExtraConfigIndex()
+        index.update(1, '{"cleanup_ts": true}')
+        index.update(2, '{"cleanup_ts": false, "delay_time": 10}')
+        self.assertEqual(index.streams_with_option('cleanup_ts'), {1, 2})
+        self.assertEqual(index.streams_with_option('cleanup_ts', True), {1})
+        self.assertEqual(index.streams_with_option('delay_time'), {2})
+
+        index.update(3, '{"restart_attempts": 5, "cleanup_ts": true}')
+        self.assertEqual(index.streams_with_option('cleanup_ts'), {1, 2, 3})
+        self.assertEqual(index.streams_with_option('restart_attempts'), set())
+
+        index.update(2, '')
+        self.assertEqual(index.streams_with_option('delay_time'), set())
+        self.assertEqual(dict(index.get(2)), {})
+        index.remove(1)
+        index.remove(3)
+        self.assertEqual(index.streams_with_option('cleanup_ts'), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
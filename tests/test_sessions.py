@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from app.common.subscriber.sessions import DeviceSessionRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DeviceSessionRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.registry = DeviceSessionRegistry(ttl=10, clock=self.clock)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'sessions.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_limit(self):
+        self.assertTrue(self.registry.admit('s', 'a', 2))
+        self.assertTrue(self.registry.admit('s', 'b', 2))
+        self.assertFalse(self.registry.admit('s', 'c', 2))
+        self.assertTrue(self.registry.admit('s', 'a', 2))
+        self.registry.release('s', 'b')
+        self.assertTrue(self.registry.admit('s', 'c', 2))
+
+    def test_ttl(self):
+        self.registry.admit('s', 'a', 2)
+        self.registry.admit('s', 'b', 2)
+        self.clock.now += 5
+        self.assertTrue(self.registry.heartbeat('s', 'a'))
+        self.clock.now += 6
+        self.assertFalse(self.registry.heartbeat('s', 'b'))
+        self.assertTrue(self.registry.admit('s', 'c', 2))
+        self.assertEqual(sorted(self.registry.active_devices('s')), ['a', 'c'])
+
+        self.clock.now += 20
+        self.assertEqual(self.registry.evict_expired(), 2)
+        self.assertEqual(self.registry.active_devices('s'), [])
+
+    def test_rejects_non_str_ids(self):
+        with self.assertRaises(TypeError):
+            self.registry.admit(1, 'a')
+        with self.assertRaises(TypeError):
+            self.registry.admit('s', 2)
+
+    def test_snapshot_round_trip(self):
+        self.registry.admit('s1', 'a', 2)
+        self.registry.admit('s1', 'b', 2)
+        self.registry.admit('s2', 'a', 5)
+        self.clock.now += 20
+        self.registry.admit('s3', 'a', 1)
+        self.registry.save_snapshot(self.path)
+
+        restored = DeviceSessionRegistry(ttl=10)
+        self.assertEqual(restored.load_snapshot(self.path), 1)
+        self.assertEqual(restored.active_devices('s3'), ['a'])
+        self.assertFalse(restored.admit('s3', 'b', 1))
+
+    def test_snapshot_enforces_limit(self):
+        with open(self.path, 'w') as snapshot:
+            json.dump({'time': 0, 'sessions': []}, snapshot)
+        self.assertEqual(self.registry.load_snapshot(self.path), 0)
+
+        rows = [['s', 'a', 1e12, 2], ['s', 'b', 3e12, 2], ['s', 'c', 2e12, 2]]
+        with open(self.path, 'w') as snapshot:
+            json.dump({'time': 1, 'sessions': rows}, snapshot)
+        self.assertEqual(self.registry.load_snapshot(self.path), 2)
+        self.assertEqual(sorted(self.registry.active_devices('s')), ['b', 'c'])
+        self.assertEqual(self.registry.load_snapshot(self.path), 0)
+
+    def test_snapshot_counts_restored(self):
+        rows = [['s', 'a', 1e12, 2], ['s', 'a', 2e12, 2], ['s', 'b', 1e12, 2]]
+        with open(self.path, 'w') as snapshot:
+            json.dump({'time': 1, 'sessions': rows}, snapshot)
+        self.assertEqual(self.registry.load_snapshot(self.path), 2)
+
+        self.registry.admit('s', 'b', 2)
+        rows = [['s', 'a', 3e12, 2], ['s', 'b', 5, 2]]
+        with open(self.path, 'w') as snapshot:
+            json.dump({'time': time.time(), 'sessions': rows}, snapshot)
+        self.assertEqual(self.registry.load_snapshot(self.path), 1)
+
+    def test_snapshot_malformed(self):
+        for content in ['', '[]', '{"time": 1}', '{"time": "x", "sessions": []}', '{"sessions": [], "time": NaN}']:
+            with open(self.path, 'w') as snapshot:
+                snapshot.write(content)
+            self.assertEqual(self.registry.load_snapshot(self.path), 0, content)
+
+        rows = [['s', 'a'], 'row', None, [1, 'a', 1e12, 2], ['s', 'a', 'x', 2], ['s', 'a', 1e12, 0],
+                ['s', 'a', float('inf'), 2], ['s', 'a', 1e12, True], ['s', 'ok', 1e12, 2]]
+        with open(self.path, 'w') as snapshot:
+            json.dump({'time': 1, 'sessions': rows}, snapshot)
+        self.assertEqual(self.registry.load_snapshot(self.path), 1)
+        self.assertEqual(self.registry.active_devices('s'), ['ok'])
+        self.assertEqual(self.registry.load_snapshot(os.path.join(self.directory, 'missing.json')), 0)
+
+    def test_concurrent_admit(self):
+        registry = DeviceSessionRegistry()
+        admitted = []
+
+        def worker(device: int):
+            count = 0
+            for i in range(2000):
+                if registry.admit('s{0}'.format(i % 50), 'd{0}'.format(device), 3):
+                    count += 1
+            admitted.append(count)
+
+        threads = [threading.Thread(target=worker, args=(device,)) for device in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(50):
+            self.assertEqual(len(registry.active_devices('s{0}'.format(i))), 3)
+        self.assertEqual(sum(admitted), 3 * 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from app.common.service import storage_probe
+from app.common.service.storage_probe import probe_directory, probe_directories, min_free_space
+
+_DiskUsage = namedtuple('_DiskUsage', ['total', 'used', 'free'])
+
+
+class StorageProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _make_dir(self, name: str) -> str:
+        path = os.path.join(self.directory, name)
+        os.mkdir(path)
+        return path
+
+    def test_missing_directory(self):
+        result = probe_directory(os.path.join(self.directory, 'missing'), 1000)
+        self.assertFalse(result.exists)
+        self.assertEqual(result.errors, ['Directory not exists'])
+        self.assertIsNone(result.meets_required_rate())
+
+    def test_not_writable_directory(self):
+        path = self._make_dir('read_only')
+        os.chmod(path, 0o555)
+        access = os.access
+
+        # root bypasses permission bits
+        def no_write_access(checked, mode):
+            if checked == path and mode & os.W_OK:
+                return False
+            return access(checked, mode)
+
+        with mock.patch.object(storage_probe.os, 'access', no_write_access), \
+                mock.patch.object(storage_probe, '_benchmark_sequential') as benchmark:
+            result = probe_directory(path, 1000)
+        os.chmod(path, 0o755)
+        self.assertTrue(result.exists)
+        self.assertTrue(result.readable)
+        self.assertFalse(result.writable)
+        self.assertIn('Directory not writable', result.errors)
+        benchmark.assert_not_called()
+
+    def test_without_benchmark(self):
+        result = probe_directory(self.directory, 1000, benchmark=False)
+        self.assertTrue(result.is_valid())
+        self.assertIsNone(result.sequential_rate)
+        self.assertIsNone(result.meets_required_rate())
+        self.assertIsNone(probe_directories({'hls_directory': self.directory}, {'hls_directory': 1000},
+                                            False)['hls_directory'].meets_required_rate())
+
+    def test_min_free_space(self):
+        self.assertEqual(min_free_space(1000, 'ext4'), 1000 * storage_probe.FREE_SPACE_SECONDS)
+        self.assertEqual(min_free_space(1000, 'tmpfs'), 1000 * storage_probe.FREE_SPACE_SECONDS)
+        self.assertEqual(min_free_space(None, 'tmpfs'), storage_probe.TMPFS_MIN_FREE_SPACE)
+        self.assertEqual(min_free_space(None, 'ext4'), storage_probe.MIN_FREE_SPACE)
+        self.assertEqual(min_free_space(None, None), storage_probe.MIN_FREE_SPACE)
+
+    def test_one_device_benchmarked_once(self):
+        directories = {'hls_directory': self._make_dir('hls'), 'vods_directory': self._make_dir('vods')}
+        with mock.patch.object(storage_probe, '_benchmark_sequential', return_value=1000.0) as sequential, \
+                mock.patch.object(storage_probe, '_benchmark_small_files', return_value=100.0) as small_files:
+            results = probe_directories(directories, {'hls_directory': 600, 'vods_directory': 600})
+        self.assertEqual(sequential.call_count, 1)
+        self.assertEqual(small_files.call_count, 1)
+        for result in results.values():
+            self.assertEqual(result.sequential_rate, 1000.0)
+            self.assertEqual(result.small_files_rate, 100.0)
+            # each directory alone fits, both together don't
+            self.assertTrue(result.meets_required_rate())
+            self.assertEqual(len(result.errors), 1)
+            self.assertIn('1200 B/s required by all directories on the device', result.errors[0])
+
+        with mock.patch.object(storage_probe, '_benchmark_sequential', return_value=1000.0), \
+                mock.patch.object(storage_probe, '_benchmark_small_files', return_value=100.0):
+            results = probe_directories(directories, {'hls_directory': 600, 'vods_directory': 400})
+        self.assertTrue(all(result.is_valid() for result in results.values()))
+
+    def test_one_device_free_space(self):
+        directories = {'hls_directory': self._make_dir('hls'), 'vods_directory': self._make_dir('vods')}
+        required = 1000 * storage_probe.FREE_SPACE_SECONDS
+        usage = _DiskUsage(4 * required, 2 * required, int(required * 1.5))
+        with mock.patch.object(storage_probe.shutil, 'disk_usage', return_value=usage):
+            results = probe_directories(directories, {'hls_directory': 1000, 'vods_directory': 1000}, False)
+            single = probe_directories({'hls_directory': directories['hls_directory']}, {'hls_directory': 1000},
+                                       False)
+        for result in results.values():
+            self.assertEqual(result.errors, ['Not enough free space, {0} bytes required by all directories on the '
+                                             'device'.format(2 * required)])
+        self.assertTrue(single['hls_directory'].is_valid())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import random
+import unittest
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app.common.stream.vod_catalog import VodCatalogIndex, tokenize
+
+_Entry = namedtuple('_Entry', 'id name description vod_type country user_score prime_date duration')
+
+_WORDS = ['alpha', 'beta', 'gamma', 'delta', 'star', 'wars', 'trek', 'love', 'night', 'day']
+
+
+def _make_entry(rand: random.Random, sid) -> _Entry:
+    prime_date = datetime(2000, 1, 1) + timedelta(days=rand.randint(0, 9000)) if rand.random() > 0.05 else None
+    return _Entry(sid, ' '.join(rand.sample(_WORDS, 2)), ' '.join(rand.sample(_WORDS, 3)), rand.randint(0, 1),
+                  rand.choice(['US', 'DE', 'FR', 'ZZ']) if rand.random() > 0.01 else 'Zz',
+                  round(rand.random() * 100, 1), prime_date, rand.randint(0, 10 ** 7))
+
+
+class VodCatalogIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(42)
+        self.entries = {}
+        self.index = VodCatalogIndex()
+
+    def _matches(self, entry: _Entry, text=None, vod_type=None, country=None) -> bool:
+        query = tokenize(text)
+        if query and not query <= tokenize(entry.name) | tokenize(entry.description):
+            return False
+        if vod_type is not None and entry.vod_type != vod_type:
+            return False
+        return country is None or entry.country.lower() == country.lower()
+
+    @staticmethod
+    def _value(entry: _Entry, sort_by: str):
+        value = getattr(entry, sort_by)
+        return value.lower() if sort_by == VodCatalogIndex.SORT_NAME and value else value
+
+    def _brute_force(self, text=None, vod_type=None, country=None, sort_by=VodCatalogIndex.SORT_NAME,
+                     descending=False, offset=0, limit=20):
+        """Total and sort values of the page, order of equal values is up to the index"""
+        values = [self._value(entry, sort_by) for entry in self.entries.values()
+                  if self._matches(entry, text, vod_type, country)]
+        with_value = sorted((value for value in values if value is not None), reverse=descending)
+        ordered = with_value + [None] * (len(values) - len(with_value))
+        return len(ordered), ordered[offset:offset + limit]
+
+    def _search(self, text=None, vod_type=None, country=None, sort_by=VodCatalogIndex.SORT_NAME,
+                descending=False, offset=0, limit=20):
+        total, sids = self.index.search(text, vod_type, country, sort_by, descending, offset, limit)
+        self.assertEqual(len(sids), len(set(sids)))
+        for sid in sids:
+            self.assertTrue(self._matches(self.entries[sid], text, vod_type, country))
+        return total, [self._value(self.entries[sid], sort_by) for sid in sids]
+
+    def _random_query(self) -> dict:
+        return {'text': self.rand.choice([None, 'star', 'star wars', 'alpha beta gamma', 'missing']),
+                'vod_type': self.rand.choice([None, 0, 1]),
+                'country': self.rand.choice([None, 'de', 'FR', 'zz', 'XX']),
+                'sort_by': self.rand.choice(VodCatalogIndex.SORT_FIELDS),
+                'descending': self.rand.random() < 0.5,
+                'offset': self.rand.choice([0, 5, 100, 1500, 5000]),
+                'limit': self.rand.choice([1, 20, 100])}
+
+    def _check_queries(self, count: int):
+        for _ in range(count):
+            query = self._random_query()
+            self.assertEqual(self._search(**query), self._brute_force(**query), query)
+
+    def test_search_matches_brute_force(self):
+        for sid in range(3000):
+            entry = _make_entry(self.rand, sid)
+            self.entries[sid] = entry
+            self.index.update_entry(entry)
+        self._check_queries(300)
+
+    def test_load_update_remove(self):
+        entries = [_make_entry(self.rand, sid) for sid in range(3000)]
+        self.entries = {entry.id: entry for entry in entries}
+        self.index.load(entries)
+        self._check_queries(100)
+
+        for sid in range(0, 3000, 3):
+            self.index.remove(sid)
+            del self.entries[sid]
+        for sid in range(1, 3000, 7):
+            entry = _make_entry(self.rand, sid)
+            self.entries[sid] = entry
+            self.index.update_entry(entry)
+        for sid in range(3000, 3200):
+            entry = _make_entry(self.rand, sid)
+            self.entries[sid] = entry
+            self.index.update_entry(entry)
+        self.assertEqual(len(self.index), len(self.entries))
+        self._check_queries(200)
+
+    def test_unknown_sort_field(self):
+        with self.assertRaises(ValueError):
+            self.index.search(sort_by='price')
+
+
+if __name__ == '__main__':
+    unittest.main()